@@ -1,20 +1,19 @@
 from __future__ import annotations
 
 import contextlib
+import copy
 import datetime
 import enum
+import functools
 import importlib.util
 import io
 import json
-import math
 import os
 import queue
 import re
 import sys
 import threading
-import time
-import webbrowser
-from collections import defaultdict
+import traceback
 from pathlib import Path
 from typing import (
     List,
@@ -48,6 +47,9 @@ if _typer_spec is not None:
 else:
     TYPER_TYPES = ()
 
+# If using typer, these parameters are automatically added
+TYPER_COMPLETION_PARAMS = frozenset({"install_completion", "show_completion"})
+
 try:
     # Click 8.3+
     from click._utils import UNSET
@@ -58,6 +60,25 @@ except ImportError:
 # Regex pattern to match ANSI escape sequences
 ANSI_ESCAPE_PATTERN = re.compile(r"\x1b\[((?:\d+;)*\d+)m")
 
+# Regex patterns to detect date and time format specifiers in click.DateTime formats
+DATE_SPEC_PATTERN = re.compile(r"%[YymdUuVWjABbax]")
+TIME_SPEC_PATTERN = re.compile(r"%[HIpMSfzZX]")
+
+# Progress bars printed by tqdm ("\r 45%|####      | 45/100 [...]") and by
+# click.progressbar ("\rlabel  [####------]  45%")
+TQDM_PATTERN = re.compile(r"\r([\d\s]+)%\|.*\|(.*)")
+CLICK_PROGRESSBAR_PATTERN = re.compile(r"\r(.*) \[(#*)(-*)\](.*)")
+
+# File type and extensions in a help text such as "Excel files (.csv, .xlsx)"
+FILE_TYPE_PATTERN = re.compile(r"(\w+) file[s]? \(([a-zA-Z ,\.]*)\)")
+FILE_EXTENSION_PATTERN = re.compile(r"\.(\w+(?:\.\w+)?)")
+
+# Once the log holds more than LOG_MAX_LENGTH characters, the oldest lines are
+# dropped to keep about LOG_KEEP_LENGTH characters (rich text controls get slow
+# with very long contents)
+LOG_MAX_LENGTH = 2_000_000
+LOG_KEEP_LENGTH = 1_500_000
+
 
 # Windows Terminal Colors
 # Mapping ANSI color codes to HTML colors
@@ -118,6 +139,59 @@ ANSI_COLORS = {
     15: TermColors["BRIGHT_WHITE"],
 }
 
+# RGB value of each terminal color, keyed by (color, bright): bold text uses the
+# bright variant (bright colors map to themselves)
+TERM_COLORS_RGB = {
+    (color, bright): (
+        TermColors["BRIGHT_" + color.name].value
+        if bright and not color.name.startswith("BRIGHT_")
+        else color.value
+    )
+    for color in TermColors
+    for bright in (False, True)
+}
+
+# Pre-decoded parameters of the most common SGR sequences (single codes such as
+# reset, bold or a color, and bold + color), to skip the split / int conversion
+_SGR_FAST = {str(code): (code,) for code in range(108)}
+_SGR_FAST.update(
+    {f"1;{code}": (1, code) for code in (*range(30, 38), *range(90, 98))}
+)
+
+# What each SGR parameter changes, as (action, color), so that each parameter is
+# dispatched with a single dict lookup. Unknown parameters are ignored
+_SGR_ACTIONS = {
+    AnsiEscapeCodes.ResetFormat: ("reset", None),
+    AnsiEscapeCodes.BoldText: ("bold", None),
+    AnsiEscapeCodes.ItalicText: ("italic", None),
+    AnsiEscapeCodes.UnderLinedText: ("underline", None),
+    AnsiEscapeCodes.StrikeThrough: ("strikethrough", None),
+    AnsiEscapeCodes.Text256Color: ("extended", None),
+    AnsiEscapeCodes.Background256Color: ("extended", None),
+}
+_SGR_ACTIONS.update(
+    {
+        start + index: (action, ANSI_COLORS[index])
+        for start, action in (
+            (AnsiEscapeCodes.TextColorStart, "fg"),
+            (AnsiEscapeCodes.BackgroundColorStart, "bg"),
+            (AnsiEscapeCodes.TextBrightColorStart, "bright_fg"),
+            (AnsiEscapeCodes.BackgroundBrightColorStart, "bright_bg"),
+        )
+        for index in range(8)
+    }
+)
+
+
+@functools.lru_cache(maxsize=256)
+def _wx_colour(rgb: tuple) -> wx.Colour:
+    """Return a cached wx.Colour for an (R, G, B) tuple.
+
+    The cache is bounded: truecolor output can use any of the 16M colours.
+    Must only be called once the wx.App exists.
+    """
+    return wx.Colour(*rgb)
+
 
 class ANSITextCtrl(wx.TextCtrl):
     def __init__(self, parent, *args, **kwargs):
@@ -128,6 +202,9 @@ class ANSITextCtrl(wx.TextCtrl):
         )
         self.gauge_value = 0
         self.gauge_is_visible = False
+        # Last values pushed to the progress bar, to skip redundant updates
+        self._last_gauge_value = -1
+        self._last_gauge_text = None
 
         # Visual indices (for clearing highlights)
         self.last_match_start = -1
@@ -140,105 +217,131 @@ class ANSITextCtrl(wx.TextCtrl):
         self.default_fg = TermColors["WHITE"]
         self.default_bg = TermColors["BLACK"]
 
-        font = get_best_monospace_font()
-        self.SetFont(
-            wx.Font(
-                10,
-                wx.FONTFAMILY_DEFAULT,
-                wx.FONTSTYLE_NORMAL,
-                wx.FONTWEIGHT_NORMAL,
-                faceName=font,
-            )
-        )
+        self.SetFont(_get_font(10, get_best_monospace_font()))
         self.SetBackgroundColour(wx.Colour(*self.default_bg.value))
+        # Text attributes already built, keyed by style (see get_text_attr)
+        self._attr_cache = {}
+        # Style restored after each append
+        self._reset_attr = self.get_text_attr(
+            self.default_fg, self.default_bg, False, False, False, False, False
+        )
+        self.SetDefaultStyle(self._reset_attr)
+
+    def get_text_attr(self, fg, bg, ul, st, it, bold_fg, bold_bg) -> wx.TextAttr:
+        """Return the (cached) wx.TextAttr of a segment style."""
+        style = (fg, bg, ul, st, it, bold_fg, bold_bg)
+        attr = self._attr_cache.get(style)
+        if attr is not None:
+            return attr
+        # Create a font that matches the default one but with underline if needed
+        font = self.GetFont()
+        if ul:
+            font.SetUnderlined(True)
+        else:
+            font.SetUnderlined(False)
+        if it:
+            font.MakeItalic()
+        if st:
+            font.SetStrikethrough(True)
+        # Create text attribute with the font
+        if bold_fg:
+            font = font.Bold()
+        # Terminal colors are resolved to RGB, RGB colors are used as is
+        color_fg = TERM_COLORS_RGB.get((fg, bold_fg), fg)
+        color_bg = TERM_COLORS_RGB.get((bg, bold_bg), bg)
+        attr = wx.TextAttr(_wx_colour(color_fg), _wx_colour(color_bg), font)
+        # Keep the cache small: drop the oldest style when full
+        if len(self._attr_cache) >= 64:
+            del self._attr_cache[next(iter(self._attr_cache))]
+        self._attr_cache[style] = attr
+        return attr
 
     def append_ansi_text(self, segments):
-        # Apply text and styles
-        for text, fg, bg, ul, st, it, bold_fg, bold_bg in segments:
-            if text:
-                # Create a font that matches the default one but with underline if needed
-                font = self.GetFont()
-                if ul:
-                    font.SetUnderlined(True)
-                else:
-                    font.SetUnderlined(False)
-                if it:
-                    font.MakeItalic()
-                if st:
-                    font.SetStrikethrough(True)
-                # Create text attribute with the font
-                if bold_fg:
-                    font = font.Bold()
-                    if isinstance(fg, TermColors):
-                        color_fg = (
-                            TermColors["BRIGHT_" + fg.name].value
-                            if "BRIGHT" not in fg.name
-                            else TermColors[fg.name].value
-                        )
-                    else:
-                        color_fg = fg
-                else:
-                    if isinstance(fg, TermColors):
-                        color_fg = TermColors[fg.name].value
-                    else:
-                        color_fg = fg
-                if bold_bg:
-                    if isinstance(fg, TermColors):
-                        color_bg = (
-                            TermColors["BRIGHT_" + bg.name].value
-                            if "BRIGHT" not in bg.name
-                            else TermColors[bg.name].value
+        # Don't repaint the control for each segment, only once at the end
+        self.Freeze()
+        appended = False
+        # The default style is always reset at the end of the previous append
+        current_attr = self._reset_attr
+        try:
+            # Apply text and styles
+            for text, *style in segments:
+                if not text:
+                    continue
+                # Progress bars redraw their line, so they start with a carriage
+                # return: only try to match the progress bar regexes in that case
+                if text[0] == "\r":
+                    # Regex to extract the progress bar value from the tqdm output
+                    regex_tqdm = TQDM_PATTERN.match(text)
+                    if regex_tqdm:
+                        self.gauge_value = int(regex_tqdm.group(1))
+                        self.update_gauge(regex_tqdm.group(2))
+                        continue
+                    regex_click_progressbar = CLICK_PROGRESSBAR_PATTERN.match(text)
+                    if regex_click_progressbar:
+                        completed = len(regex_click_progressbar.group(2))
+                        total = completed + len(regex_click_progressbar.group(3))
+                        if total > 0:
+                            self.gauge_value = int((completed / total) * 100)
+                        else:
+                            self.gauge_value = 0
+                        self.update_gauge(
+                            regex_click_progressbar.group(1)
+                            + " "
+                            + regex_click_progressbar.group(4)
                         )
-                    else:
-                        color_bg = bg
-                else:
-                    if isinstance(bg, TermColors):
-                        color_bg = TermColors[bg.name].value
-                    else:
-                        color_bg = bg
-
-                style = wx.TextAttr(wx.Colour(*color_fg), wx.Colour(*color_bg), font)
-                self.SetDefaultStyle(style)
-                # Regex to extract the progress bar value from the tqdm output
-                regex_tqdm = re.match(r"\r([\d\s]+)%\|.*\|(.*)", text)
-                regex_click_progressbar = re.match(r"\r(.*) \[(#*)(-*)\](.*)", text)
-                if regex_tqdm:
-                    if not self.gauge_is_visible:
-                        self.gauge_sizer.ShowItems(True)
-                        self.gauge_is_visible = True
-                        self.Layout()
-                    self.gauge_value = int(regex_tqdm.group(1))
-                    self.gauge.SetValue(self.gauge_value)
-                    self.gauge_text.SetValue(regex_tqdm.group(2))
-                elif regex_click_progressbar:
-                    if not self.gauge_is_visible:
-                        self.gauge_sizer.ShowItems(True)
-                        self.gauge_is_visible = True
-                        self.Layout()
-                    completed = len(regex_click_progressbar.group(2))
-                    total = completed + len(regex_click_progressbar.group(3))
-                    if total > 0:
-                        self.gauge_value = int((completed / total) * 100)
-                    else:
-                        self.gauge_value = 0
-                    self.gauge.SetValue(self.gauge_value)
-                    self.gauge_text.SetValue(
-                        regex_click_progressbar.group(1)
-                        + " "
-                        + regex_click_progressbar.group(4)
-                    )
-                else:
-                    self.AppendText(text)
-        # Reset style at the end
-        default_font = self.GetFont()
-        default_font.SetUnderlined(False)
-        self.SetDefaultStyle(
-            wx.TextAttr(
-                wx.Colour(*self.default_fg.value),
-                wx.Colour(*self.default_bg.value),
-                default_font,
-            )
-        )
+                        continue
+                attr = self.get_text_attr(*style)
+                if attr is not current_attr:
+                    self.SetDefaultStyle(attr)
+                    current_attr = attr
+                self.AppendText(text)
+                appended = True
+            # Reset style at the end
+            if current_attr is not self._reset_attr:
+                self.SetDefaultStyle(self._reset_attr)
+            if appended:
+                self.trim_log()
+        finally:
+            self.Thaw()
+        # Scroll to the end once, after all the text has been appended
+        if appended:
+            self.ShowPosition(self.GetLastPosition())
+
+    def trim_log(self):
+        """Drop the oldest lines if the log is longer than LOG_MAX_LENGTH"""
+        last_position = self.GetLastPosition()
+        if last_position <= LOG_MAX_LENGTH:
+            return
+        # The search highlight positions would be shifted: clear it first
+        self.clear_highlight()
+        self.last_py_start = -1
+        self.last_py_end = -1
+        # Cut at the beginning of a line
+        cut_position = last_position - LOG_KEEP_LENGTH
+        found, _, line = self.PositionToXY(cut_position)
+        if found:
+            line_start = self.XYToPosition(0, line + 1)
+            if line_start != -1:
+                cut_position = line_start
+        self.Remove(0, cut_position)
+
+    def update_gauge(self, text):
+        """Show the progress bar of the parent LogPanel and update it.
+
+        The layout is only recomputed the first time the progress bar is shown,
+        and the widgets are only touched when the value or the text changed.
+        """
+        log_panel = self.GetParent()
+        if not self.gauge_is_visible:
+            log_panel.gauge_sizer.ShowItems(True)
+            self.gauge_is_visible = True
+            log_panel.Layout()
+        if self.gauge_value != self._last_gauge_value:
+            log_panel.gauge.SetValue(self.gauge_value)
+            self._last_gauge_value = self.gauge_value
+        if text != self._last_gauge_text:
+            log_panel.gauge_text.SetValue(text)
+            self._last_gauge_text = text
 
     def python_to_wx_index(self, full_text, python_index):
         """
@@ -311,7 +414,7 @@ class ANSITextCtrl(wx.TextCtrl):
             self.saved_fg_color = self.GetForegroundColour()
 
         # Highlight found text
-        highlight_style = wx.TextAttr(wx.SystemSettings.GetColour(wx.SYS_COLOUR_HIGHLIGHTTEXT), wx.SystemSettings.GetColour(wx.SYS_COLOUR_HIGHLIGHT))
+        highlight_style = wx.TextAttr(_get_colour(wx.SYS_COLOUR_HIGHLIGHTTEXT), _get_colour(wx.SYS_COLOUR_HIGHLIGHT))
 
         self.SetStyle(wx_start, wx_end, highlight_style)
         self.ShowPosition(wx_start)
@@ -363,20 +466,14 @@ class ANSIStyledTextCtrl(stc.StyledTextCtrl):
         self.SetUndoCollection(False)
         self.SetWrapMode(stc.STC_WRAP_NONE)
         self.SetMarginWidth(1, 0)
-        self.StyleSetFont(stc.STC_STYLE_DEFAULT,
-            wx.Font(
-                10,
-                wx.FONTFAMILY_DEFAULT,
-                wx.FONTSTYLE_NORMAL,
-                wx.FONTWEIGHT_NORMAL,
-                faceName=get_best_monospace_font(),
-            )
+        self.StyleSetFont(
+            stc.STC_STYLE_DEFAULT, _get_font(10, get_best_monospace_font())
         )
         self.StyleSetForeground(stc.STC_STYLE_DEFAULT, wx.Colour(*self.default_fg.value))
         self.StyleSetBackground(stc.STC_STYLE_DEFAULT, wx.Colour(*self.default_bg.value))
         self.StyleClearAll()
-        self.SetSelBackground(True, wx.SystemSettings.GetColour(wx.SYS_COLOUR_HIGHLIGHT))
-        self.SetSelForeground(True, wx.SystemSettings.GetColour(wx.SYS_COLOUR_HIGHLIGHTTEXT))
+        self.SetSelBackground(True, _get_colour(wx.SYS_COLOUR_HIGHLIGHT))
+        self.SetSelForeground(True, _get_colour(wx.SYS_COLOUR_HIGHLIGHTTEXT))
 
     def _center_on_pos(self, pos):
         """Helper to smoothly center the camera on a specific byte position"""
@@ -476,35 +573,9 @@ class ANSIStyledTextCtrl(stc.StyledTextCtrl):
                 # if st:
                 #     font.SetStrikethrough(True)
                 # # Create text attribute with the font
-                if bold_fg:
-                    # font = font.Bold()
-                    if isinstance(fg, TermColors):
-                        color_fg = (
-                            TermColors["BRIGHT_" + fg.name].value
-                            if "BRIGHT" not in fg.name
-                            else TermColors[fg.name].value
-                        )
-                    else:
-                        color_fg = fg
-                else:
-                    if isinstance(fg, TermColors):
-                        color_fg = TermColors[fg.name].value
-                    else:
-                        color_fg = fg
-                if bold_bg:
-                    if isinstance(fg, TermColors):
-                        color_bg = (
-                            TermColors["BRIGHT_" + bg.name].value
-                            if "BRIGHT" not in bg.name
-                            else TermColors[bg.name].value
-                        )
-                    else:
-                        color_bg = bg
-                else:
-                    if isinstance(bg, TermColors):
-                        color_bg = TermColors[bg.name].value
-                    else:
-                        color_bg = bg
+                # Terminal colors are resolved to RGB, RGB colors are used as is
+                color_fg = TERM_COLORS_RGB.get((fg, bold_fg), fg)
+                color_bg = TERM_COLORS_RGB.get((bg, bold_bg), bg)
                 byte_len = len(text.encode("utf-8"))
                 full_text.append(text)
                 styles.append((byte_len, (color_fg, color_bg, ul, st, it, bold_fg)))
@@ -650,25 +721,16 @@ class LogPanel(wx.Panel):
 
     def __init__(self, parent: Guick, color_engine="optimized"):
         super().__init__(parent)
-        self.SetBackgroundColour(wx.SystemSettings.GetColour(wx.SYS_COLOUR_WINDOW))
+        self.SetBackgroundColour(_get_colour(wx.SYS_COLOUR_WINDOW))
 
         box_sizer = wx.BoxSizer(wx.VERTICAL)
 
         # Create the progessbar in case of tqdm
         self.gauge = wx.Gauge(self, -1, 100, size=(-1, 5))
-        font = get_best_monospace_font()
         self.gauge_text = wx.TextCtrl(
             self, -1, "", size=(400, -1), style=wx.TE_READONLY | wx.NO_BORDER
         )
-        self.gauge_text.SetFont(
-            wx.Font(
-                8,
-                wx.FONTFAMILY_DEFAULT,
-                wx.FONTSTYLE_NORMAL,
-                wx.FONTWEIGHT_NORMAL,
-                faceName=font,
-            )
-        )
+        self.gauge_text.SetFont(_get_font(8, get_best_monospace_font()))
         self.gauge_sizer = wx.BoxSizer(wx.VERTICAL)
         self.gauge_sizer.Add(self.gauge, 1, wx.EXPAND | wx.ALL, 2)
         self.gauge_sizer.Add(self.gauge_text, 1, wx.EXPAND | wx.ALL, 2)
@@ -744,11 +806,7 @@ class AboutDialog(wx.Dialog):
         self.text_ctrl.SetBackgroundColour(bg_color)
 
         # Set Monospace Font (Must be done BEFORE calculating size)
-        f_size = int(font_size)
-        mono_font = get_best_monospace_font()
-        font_info = wx.FontInfo(f_size).FaceName(mono_font)
-        mono_font = wx.Font(font_info)
-        self.text_ctrl.SetFont(mono_font)
+        self.text_ctrl.SetFont(_get_font(int(font_size), get_best_monospace_font()))
 
         # Manual Sizing
         # TextCtrl generally doesn't "Fit" as tightly as StaticText,
@@ -784,15 +842,49 @@ class AboutDialog(wx.Dialog):
 
     def OnLinkClicked(self, event):
         if event.MouseEvent.LeftUp():
+            # Only needed when a link is clicked, don't import it at startup
+            import webbrowser
+
             url = self.text_ctrl.GetRange(event.GetURLStart(), event.GetURLEnd())
             webbrowser.open(url)
         event.Skip()
 
 
+@functools.lru_cache(maxsize=64)
+def _get_font(
+    size: int, face: str = "", bold: bool = False, italic: bool = False
+) -> wx.Font:
+    """Return a cached wx.Font.
+
+    Must only be called once the wx.App exists. The returned font is shared,
+    so callers must not modify it in place.
+    """
+    font_info = wx.FontInfo(size)
+    if face:
+        font_info.FaceName(face)
+    if bold:
+        font_info.Bold()
+    if italic:
+        font_info.Italic()
+    return wx.Font(font_info)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_colour(index: int) -> wx.Colour:
+    """Return a cached system colour (see wx.SystemSettings.GetColour).
+
+    Must only be called once the wx.App exists. The returned colour is shared,
+    so callers must not modify it in place.
+    """
+    return wx.SystemSettings.GetColour(index)
+
+
+@functools.lru_cache(maxsize=None)
 def get_best_monospace_font() -> str:
+    # The installed fonts are only enumerated once per process
     font_enum = wx.FontEnumerator()
     font_enum.EnumerateFacenames()
-    available_fonts = font_enum.GetFacenames()
+    available_fonts = set(font_enum.GetFacenames())
 
     # Preferred monospace fonts (order matters)
     monospace_fonts = [
@@ -812,17 +904,19 @@ def get_best_monospace_font() -> str:
 
 class RedirectText:
     def __init__(
-        self, my_text_ctrl: ANSITextCtrl, batch_size=5000, flush_interval=0.1
+        self, my_text_ctrl: ANSITextCtrl, batch_size=5000, flush_interval=0.05
     ) -> None:
         self.text_ctrl = my_text_ctrl
-        self.queue = queue.Queue()
+        self.queue = queue.SimpleQueue()
         self.batch_size = batch_size
         self.flush_interval = flush_interval
-        self.running = True
 
-        # Start the batch processor thread
-        self.thread = threading.Thread(target=self._process_queue, daemon=True)
-        self.thread.start()
+        # Drain the queue from the GUI thread on a timer, so that the command
+        # thread only has to enqueue its output
+        self.timer = wx.Timer(my_text_ctrl)
+        my_text_ctrl.Bind(wx.EVT_TIMER, self._process_queue, self.timer)
+        my_text_ctrl.Bind(wx.EVT_WINDOW_DESTROY, self._on_destroy)
+        self.timer.Start(int(flush_interval * 1000))
 
     def write(self, string: str) -> None:
         # Only queue non-empty messages
@@ -835,49 +929,21 @@ class RedirectText:
     def flush(self):
         pass
 
-    def _process_queue(self):
-        """Background thread that batches and sends logs to GUI"""
+    def _process_queue(self, event):
+        """Send the queued messages to the GUI, at most batch_size per tick"""
         buffer = []
-        last_flush = time.time()
-
-        while self.running:
-            flush_now = False
-            # Try to get messages without blocking too long
-            while True:
-                try:
-                    msg = self.queue.get(timeout=0.05)
-
-                    if msg is None:
-                        flush_now = True
-                        break
-
-                    # msg = self.queue.get_nowait()
-                    # buffer.append(msg)
-                    if isinstance(msg, bytes):
-                        msg = msg.decode("utf-8", errors="replace")
-                    buffer.append(str(msg))
-
-                    if len(buffer) >= self.batch_size or (time.time() - last_flush) >= self.flush_interval:
-                        break
-                except queue.Empty:
-                    # Queue is empty, break and check if we should flush
-                    break
-
-            # Flush if we have messages and either:
-            # - buffer is full, or
-            # - enough time has passed
-            if buffer and (
-                len(buffer) >= self.batch_size
-                or time.time() - last_flush >= self.flush_interval or flush_now
-            ):
-                combined = "".join(buffer)
-                print(
-                    f"[DEBUG] Flushing {len(buffer)} messages to GUI",
-                    file=sys.__stdout__,
-                )
-                wx.CallAfter(self._update_text_ctrl, combined)
-                buffer.clear()
-                last_flush = time.time()
+        with contextlib.suppress(queue.Empty):
+            while len(buffer) < self.batch_size:
+                buffer.append(self.queue.get_nowait())
+        if buffer:
+            self._update_text_ctrl("".join(buffer))
+
+    def _on_destroy(self, event):
+        # The event propagates from the children (e.g. popups): only stop
+        # draining when the log control itself is destroyed
+        if event.GetEventObject() is self.text_ctrl:
+            self.timer.Stop()
+        event.Skip()
 
     def isatty(self):
         # Pretend it's a TTY (so that we can use colorized output)
@@ -889,157 +955,203 @@ class RedirectText:
     def _update_text_ctrl(self, text):
         """Update the TextCtrl on the GUI thread"""
         if self.text_ctrl:
-            # Find all ANSI color code segments
-            segments = []
-            last_end = 0
-            current_fg = self.default_fg
-            current_bg = self.default_bg
-            underline = False
-            strikethrough = False
-            italic = False
-            bold_fg = False
-            bold_bg = False
-            # self.SetForegroundColour(wx.Colour(*TermColors.WHITE.value))
-            # Split the message by ANSI codes
-            if isinstance(text, bytes):
-                text = text.decode("utf-8", errors="replace")
-            for match in ANSI_ESCAPE_PATTERN.finditer(text):
-                # Add text before the ANSI code
-                if match.start() > last_end:
-                    segments.append(
-                        (
-                            text[last_end : match.start()],
-                            current_fg,
-                            current_bg,
-                            underline,
-                            strikethrough,
-                            italic,
-                            bold_fg,
-                            bold_bg,
-                        )
-                    )
-
-                # Extract and interpret ANSI code parameters
-                params_str = match.group(1)
-                # print(f"{params_str=}")
-                params = iter([int(p) for p in params_str.split(";") if p])
-                for param in params:
-                    # Process ANSI parameters
-                    if param == AnsiEscapeCodes.ResetFormat:
-                        current_fg = self.default_fg
-                        current_bg = self.default_bg
-                        underline = False
-                        italic = False
-                        bold_fg = False
-                        bold_bg = False
-                        strikethrough = False
-                    elif param == AnsiEscapeCodes.UnderLinedText:
-                        underline = True
-                    elif param == AnsiEscapeCodes.StrikeThrough:
-                        strikethrough = True
-                    elif param == AnsiEscapeCodes.ItalicText:
-                        italic = True
-                    elif param == AnsiEscapeCodes.BoldText:
-                        bold_fg = True
-                    elif (
-                        AnsiEscapeCodes.BackgroundColorStart
-                        <= param
-                        <= AnsiEscapeCodes.BackgroundColorEnd
-                    ):
-                        current_bg = ANSI_COLORS[
-                            param - AnsiEscapeCodes.BackgroundColorStart
-                        ]
-                    elif (
-                        AnsiEscapeCodes.TextColorStart
-                        <= param
-                        <= AnsiEscapeCodes.TextColorEnd
-                    ):
-                        current_fg = ANSI_COLORS[param - AnsiEscapeCodes.TextColorStart]
-                    elif (
-                        AnsiEscapeCodes.BackgroundBrightColorStart
-                        <= param
-                        <= AnsiEscapeCodes.BackgroundBrightColorEnd
-                    ):
-                        current_bg = ANSI_COLORS[
-                            param - AnsiEscapeCodes.BackgroundBrightColorStart
-                        ]
-                        bold_bg = True
-                    elif (
-                        AnsiEscapeCodes.TextBrightColorStart
-                        <= param
-                        <= AnsiEscapeCodes.TextBrightColorEnd
-                    ):
-                        current_fg = ANSI_COLORS[
-                            param - AnsiEscapeCodes.TextBrightColorStart
-                        ]
-                        bold_fg = True
-                    # 256 colors or RGB
-                    elif param in {
-                        AnsiEscapeCodes.Text256Color,
-                        AnsiEscapeCodes.Background256Color,
-                    }:
-                        second_param = next(params, None)
-                        # 256 colors
-                        if second_param == 5:
-                            color_code = next(params, None)
-                            # Standard colors
-                            if color_code < 16:
-                                color = ANSI_COLORS[color_code]
-                            # 6 x 6 x 6 color cube
-                            elif 16 <= color_code <= 231:
-                                color_code -= 16
-                                r = color_code // 36
-                                g = (color_code % 36) // 6
-                                b = color_code % 6
-
-                                def level(n):
-                                    return 0 if n == 0 else 55 + n * 40
-
-                                color = (level(r), level(g), level(b))
-
-                            else:
-                                # Grayscale ramp
-                                gray = 8 + (color_code - 232) * 10
-                                color = (gray, gray, gray)
-                            # print(f"{color=}")
-                        # rgb values
-                        elif second_param == 2:
-                            red = next(params, None)
-                            green = next(params, None)
-                            blue = next(params, None)
-                            color = (red, green, blue)
-                        if param == AnsiEscapeCodes.Text256Color:
-                            current_fg = color
-                        else:
-                            current_bg = color
-
-                last_end = match.end()
-
-            # Add remaining text
-            if last_end < len(text):
-                segments.append(
+            if "\x1b[" not in text:
+                # No escape sequence: the whole text uses the default style
+                segments = (
                     (
-                        text[last_end:],
-                        current_fg,
-                        current_bg,
-                        underline,
-                        strikethrough,
-                        italic,
-                        bold_fg,
-                        bold_bg,
-                    )
+                        text,
+                        self.default_fg,
+                        self.default_bg,
+                        False,
+                        False,
+                        False,
+                        False,
+                        False,
+                    ),
                 )
+            else:
+                # The segments are parsed while the control consumes them
+                segments = self.iter_segments(text)
             self.text_ctrl.append_ansi_text(segments)
 
-    def shutdown(self):
-        """Stop the background thread"""
-        import traceback
+    def iter_segments(self, text):
+        """Yield the segments of text, split by the ANSI SGR sequences.
+
+        Each segment is (text, fg, bg, underline, strikethrough, italic,
+        bold_fg, bold_bg).
+        """
+        # Consecutive pieces of text sharing the same style, merged into a
+        # single segment once the style changes
+        pending = []
+        pending_style = None
+        last_end = 0
+        current_fg = self.default_fg
+        current_bg = self.default_bg
+        underline = False
+        strikethrough = False
+        italic = False
+        bold_fg = False
+        bold_bg = False
+        # self.SetForegroundColour(wx.Colour(*TermColors.WHITE.value))
+        # Split the message by ANSI codes
+        # Scan for "ESC [ params m" with str.find rather than the regex, which
+        # would allocate a match object per escape sequence
+        search_pos = 0
+        while True:
+            start = text.find("\x1b[", search_pos)
+            if start == -1:
+                break
+            end = text.find("m", start + 2)
+            if end == -1:
+                break
+            params_str = text[start + 2 : end]
+            params = _SGR_FAST.get(params_str)
+            if params is None:
+                if not ANSI_ESCAPE_PATTERN.fullmatch(text, start, end + 1):
+                    # Not an SGR sequence: keep it as plain text
+                    search_pos = start + 1
+                    continue
+                # The pattern guarantees non-empty, numeric parameters: convert
+                # them lazily, as they are consumed
+                params = map(int, params_str.split(";"))
+
+            # Add text before the ANSI code
+            if start > last_end:
+                chunk = text[last_end:start]
+                style = (
+                    current_fg,
+                    current_bg,
+                    underline,
+                    strikethrough,
+                    italic,
+                    bold_fg,
+                    bold_bg,
+                )
+                # Progress bars ("\r...") must stay in their own segment
+                if (
+                    style == pending_style
+                    and chunk[0] != "\r"
+                    and pending[0][0] != "\r"
+                ):
+                    pending.append(chunk)
+                else:
+                    if pending:
+                        yield ("".join(pending), *pending_style)
+                    pending = [chunk]
+                    pending_style = style
+
+            # Interpret ANSI code parameters
+            params = iter(params)
+            for param in params:
+                # Process ANSI parameters
+                sgr_action = _SGR_ACTIONS.get(param)
+                if sgr_action is None:
+                    continue
+                action, color = sgr_action
+                if action == "fg":
+                    current_fg = color
+                elif action == "reset":
+                    current_fg = self.default_fg
+                    current_bg = self.default_bg
+                    underline = False
+                    italic = False
+                    bold_fg = False
+                    bold_bg = False
+                    strikethrough = False
+                elif action == "bold":
+                    bold_fg = True
+                elif action == "bg":
+                    current_bg = color
+                elif action == "bright_fg":
+                    current_fg = color
+                    bold_fg = True
+                elif action == "bright_bg":
+                    current_bg = color
+                    bold_bg = True
+                elif action == "underline":
+                    underline = True
+                elif action == "italic":
+                    italic = True
+                elif action == "strikethrough":
+                    strikethrough = True
+                # 256 colors or RGB
+                else:
+                    second_param = next(params, None)
+                    # 256 colors
+                    if second_param == 5:
+                        color_code = next(params, None)
+                        # Incomplete or out of range sequence: ignore it
+                        if color_code is None or color_code > 255:
+                            color = None
+                        # Standard colors
+                        elif color_code < 16:
+                            color = ANSI_COLORS[color_code]
+                        # 6 x 6 x 6 color cube
+                        elif 16 <= color_code <= 231:
+                            color_code -= 16
+                            r = color_code // 36
+                            g = (color_code % 36) // 6
+                            b = color_code % 6
+
+                            def level(n):
+                                return 0 if n == 0 else 55 + n * 40
+
+                            color = (level(r), level(g), level(b))
 
-        print(f"[DEBUG] shutdown() called! Stack trace:", file=sys.__stdout__)
-        traceback.print_stack(file=sys.__stdout__)
-        self.running = False
-        if self.thread.is_alive():
-            self.thread.join(timeout=1)
+                        else:
+                            # Grayscale ramp
+                            gray = 8 + (color_code - 232) * 10
+                            color = (gray, gray, gray)
+                        # print(f"{color=}")
+                    # rgb values
+                    elif second_param == 2:
+                        rgb = [next(params, None) for _ in range(3)]
+                        # Incomplete sequence: ignore it
+                        if None in rgb:
+                            color = None
+                        # Out of range values are clamped
+                        else:
+                            color = tuple(min(value, 255) for value in rgb)
+                    if color is None:
+                        # Incomplete or unknown sequence: ignore it
+                        continue
+                    if param == AnsiEscapeCodes.Text256Color:
+                        current_fg = color
+                    else:
+                        current_bg = color
+
+            last_end = search_pos = end + 1
+
+        # Add remaining text
+        if last_end < len(text):
+            chunk = text[last_end:]
+            style = (
+                current_fg,
+                current_bg,
+                underline,
+                strikethrough,
+                italic,
+                bold_fg,
+                bold_bg,
+            )
+            # Progress bars ("\r...") must stay in their own segment
+            if (
+                style == pending_style
+                and chunk[0] != "\r"
+                and pending[0][0] != "\r"
+            ):
+                pending.append(chunk)
+            else:
+                if pending:
+                    yield ("".join(pending), *pending_style)
+                pending = [chunk]
+                pending_style = style
+        if pending:
+            yield ("".join(pending), *pending_style)
+
+    def shutdown(self):
+        """Stop draining the queue"""
+        self.timer.Stop()
 
 
 class NavButton(wx.Panel):
@@ -1054,13 +1166,13 @@ class NavButton(wx.Panel):
         self.help = help
 
         # Use system colors
-        self.normal_color = wx.SystemSettings.GetColour(wx.SYS_COLOUR_BTNFACE)
-        self.hover_color = wx.SystemSettings.GetColour(wx.SYS_COLOUR_BTNHIGHLIGHT)
-        self.selected_color = wx.SystemSettings.GetColour(wx.SYS_COLOUR_HIGHLIGHT)
-        self.selected_text_color = wx.SystemSettings.GetColour(
+        self.normal_color = _get_colour(wx.SYS_COLOUR_BTNFACE)
+        self.hover_color = _get_colour(wx.SYS_COLOUR_BTNHIGHLIGHT)
+        self.selected_color = _get_colour(wx.SYS_COLOUR_HIGHLIGHT)
+        self.selected_text_color = _get_colour(
             wx.SYS_COLOUR_HIGHLIGHTTEXT
         )
-        self.normal_text_color = wx.SystemSettings.GetColour(wx.SYS_COLOUR_BTNTEXT)
+        self.normal_text_color = _get_colour(wx.SYS_COLOUR_BTNTEXT)
         self.deprecated_colour = blend(self.normal_text_color, self.normal_color, 0.5)
         self.selected_deprecated_colour = blend(
             self.selected_text_color, self.selected_color, 0.5
@@ -1138,11 +1250,12 @@ class NavButton(wx.Panel):
 
 
 class NormalEntry:
-    longest_param_name = ""
+    label_min_size = wx.DefaultSize
 
     @classmethod
-    def init_class(cls, param_name: str) -> None:
-        cls.longest_param_name = param_name
+    def init_class(cls, window: wx.Window, param_name: str) -> None:
+        """Set the label size fitting the longest parameter name of a panel."""
+        cls.label_min_size = window.GetTextExtent(param_name + " *")
 
     def __init__(self, **kwargs) -> None:
         self.param = kwargs["param"]
@@ -1158,13 +1271,9 @@ class NormalEntry:
         self.build_error()
 
     def build_label(self) -> None:
-        self.static_text = wx.StaticText(
-            self.parent, -1, NormalEntry.longest_param_name + " *"
-        )
-        size = self.static_text.GetSize()
-        self.static_text.SetMinSize(size)
         required = " *" if self.param.required else ""
-        self.static_text.SetLabel(self.param.name + required)
+        self.static_text = wx.StaticText(self.parent, -1, self.param.name + required)
+        self.static_text.SetMinSize(NormalEntry.label_min_size)
 
         # Deprecated parameters
         if self.param.deprecated:
@@ -1179,12 +1288,12 @@ class NormalEntry:
             font.SetStyle(wx.FONTSTYLE_ITALIC)
             self.static_text.SetFont(font)
 
-        if hasattr(self.param, "help"):
-            self.static_text.SetToolTip(self.param.help)
+        if help_text := getattr(self.param, "help", None):
+            self.static_text.SetToolTip(help_text)
 
     def build_entry(self) -> None:
         # Password
-        if hasattr(self.param, "hide_input") and self.param.hide_input:
+        if getattr(self.param, "hide_input", False):
             self.entry = wx.TextCtrl(self.parent, -1, style=wx.TE_PASSWORD)
         # Normal case
         else:
@@ -1200,18 +1309,20 @@ class NormalEntry:
 
     def build_error(self) -> None:
         self.text_error = wx.StaticText(self.parent, -1, "")
-        font = wx.Font(wx.FontInfo(8))
         self.text_error.SetMinSize(self.min_size)
-        self.text_error.SetFont(font)
+        self.text_error.SetFont(_get_font(8))
         self.text_error.SetForegroundColour((255, 0, 0))
 
 
 class ChoiceEntry(NormalEntry):
     def build_entry(self) -> None:
-        choices = [
-            choice.name if isinstance(choice, enum.Enum) else str(choice)
-            for choice in self.param.type.choices
-        ]
+        # Choices are homogeneous in practice (all Enum members or not), so
+        # probe only the first one
+        param_choices = self.param.type.choices
+        if param_choices and isinstance(param_choices[0], enum.Enum):
+            choices = [choice.name for choice in param_choices]
+        else:
+            choices = list(map(str, param_choices))
         self.entry = wx.ComboBox(self.parent, -1, choices=choices)
         self.entry.SetMinSize(self.min_size)
         if self.default_text:
@@ -1235,6 +1346,16 @@ class BoolEntry(NormalEntry):
         self.parent.SetFocus()
 
 
+def _tick_frequency(span: int) -> int:
+    """Return the largest power of ten lower than span (at least 1)."""
+    # Integer equivalent of 10 ** ceil(log10(span) - 1), which fails for
+    # span <= 0
+    frequency = 1
+    while frequency * 10 < span:
+        frequency *= 10
+    return frequency
+
+
 class SliderEntry(NormalEntry):
     def build_entry(self) -> None:
         initial_value = (
@@ -1250,14 +1371,7 @@ class SliderEntry(NormalEntry):
         self.entry.SetMinSize(self.min_size)
 
         self.entry.SetTickFreq(
-            int(
-                math.pow(
-                    10,
-                    math.ceil(
-                        math.log10(self.param.type.max - self.param.type.min) - 1
-                    ),
-                )
-            )
+            _tick_frequency(self.param.type.max - self.param.type.min)
         )
 
 
@@ -1277,8 +1391,6 @@ class DateTimeEntry(NormalEntry):
     def __init__(self, **kwargs) -> None:
         self.button = None
         self.param = kwargs.get("param")
-        print(dir(self.param))
-        print(self.param.type.formats)
         self.callback = kwargs.get("callback")
         super().__init__(**kwargs)
 
@@ -1297,6 +1409,53 @@ class DateTimeEntry(NormalEntry):
         self.button.Bind(wx.EVT_BUTTON, self.callback)
 
 
+@functools.lru_cache(maxsize=None)
+def _most_complete_format(formats: tuple) -> str:
+    """Return the format with the most format specifiers."""
+    best = formats[0]
+    best_count = best.count("%")
+    for format_str in formats[1:]:
+        count = format_str.count("%")
+        if count > best_count:
+            best, best_count = format_str, count
+    return best
+
+
+@functools.lru_cache(maxsize=None)
+def _formatted_length(format_str: str) -> int:
+    """Return the length of a dummy datetime formatted with format_str."""
+    return len(datetime.datetime(2000, 1, 1).strftime(format_str))
+
+
+@functools.lru_cache(maxsize=None)
+def _date_time_mode(formats: tuple) -> str:
+    """Return the picker to show ("date", "time" or "datetime") for formats."""
+    show_date = any(DATE_SPEC_PATTERN.search(format_str) for format_str in formats)
+    show_time = any(TIME_SPEC_PATTERN.search(format_str) for format_str in formats)
+    if show_time and not show_date:
+        return "time"
+    if show_date and not show_time:
+        return "date"
+    return "datetime"
+
+
+@functools.lru_cache(maxsize=None)
+def _file_wildcards(help_text: str) -> str:
+    """Return the file dialog wildcard matching the file types in help_text."""
+    # If help text is something like:
+    # Excel file (.xlsx, .csv)
+    # Text file (.txt or .log)
+    # Extract the file type and the extensions, so that the file
+    # dialog can filter the files
+    wildcard_raw = FILE_TYPE_PATTERN.search(help_text)
+    if not wildcard_raw:
+        return "All files|*.*"
+    file_type, extensions_raw = wildcard_raw.groups()
+    extensions = FILE_EXTENSION_PATTERN.findall(extensions_raw)
+    extensions_text = ";".join([f"*.{ext}" for ext in extensions])
+    return f"{file_type} files|{extensions_text}"
+
+
 class ParameterSection:
     def __init__(
         self,
@@ -1323,7 +1482,7 @@ class ParameterSection:
 
         # # StaticBox with bold font
         sb = wx.StaticBox(panel, label=label)
-        sb.SetFont(wx.Font(wx.FontInfo(10).Bold()))
+        sb.SetFont(_get_font(10, bold=True))
 
         # BoxSizer wrapping the StaticBox
         self.boxsizer = wx.StaticBoxSizer(sb, wx.VERTICAL)
@@ -1340,26 +1499,33 @@ class ParameterSection:
         self.gbs.AddGrowableCol(1)
 
     def _populate(self) -> None:
+        # Values saved in history.toml by a previous run of this command, if any
+        try:
+            command_history = self.config[self.command_name]
+        except (TypeError, KeyError):
+            command_history = {}
         idx_param = -1
         for param in self.params:
             if (
                 not param.is_eager
-                # If using typer, these parameters are automatically added
-                and param.name not in {"install_completion", "show_completion"}
-                and (
-                    (hasattr(param, "hidden") and not param.hidden)
-                    or (not hasattr(param, "hidden"))
-                )
+                and param.name not in TYPER_COMPLETION_PARAMS
+                and not getattr(param, "hidden", False)
             ):
                 idx_param += 1
-                try:
-                    # If previous run, prefill this field with the one saved in
-                    # history.toml
-                    config_value = self.config[self.command_name][param.name]
-                    prefilled_value = (
-                        str(config_value) if config_value not in {UNSET, None} else ""
-                    )
-                except (TypeError, KeyError):
+                # If previous run, prefill this field with the one saved in
+                # history.toml
+                if param.name in command_history:
+                    config_value = command_history[param.name]
+                    # Identity checks: lists (multiple / nargs parameters) are
+                    # not hashable
+                    if config_value is UNSET or config_value is None:
+                        prefilled_value = ""
+                    # Lists are entered as JSON
+                    elif isinstance(config_value, tomlkit.items.Array):
+                        prefilled_value = json.dumps(config_value.unwrap())
+                    else:
+                        prefilled_value = str(config_value)
+                else:
                     prefilled_value = None
 
                 # If the parameter has an envvar, prefill with its value
@@ -1392,10 +1558,7 @@ class ParameterSection:
                         param=param,
                         default_text=prefilled_value,
                         hint=hint_value,
-                        callback=lambda evt, param=param: self.file_open(
-                            evt,
-                            param,
-                        ),
+                        callback=functools.partial(self.file_open, param=param),
                     )
                     # self.button[param.name] = widgets.button
 
@@ -1406,9 +1569,7 @@ class ParameterSection:
                         param=param,
                         default_text=prefilled_value,
                         hint=hint_value,
-                        callback=lambda evt, param=param.name: self.dir_open(
-                            evt, param
-                        ),
+                        callback=functools.partial(self.dir_open, param=param),
                     )
                     # self.button[param.name] = widgets.button
 
@@ -1433,10 +1594,8 @@ class ParameterSection:
                 # IntRange: Slider only if min and max defined
                 elif (
                     isinstance(param.type, click.types.IntRange)
-                    and hasattr(param.type, "min")
-                    and hasattr(param.type, "max")
-                    and param.type.min is not None
-                    and param.type.max is not None
+                    and getattr(param.type, "min", None) is not None
+                    and getattr(param.type, "max", None) is not None
                 ):
                     widgets = SliderEntry(
                         parent=self.panel,
@@ -1454,9 +1613,8 @@ class ParameterSection:
                         param=param,
                         default_text=prefilled_value,
                         hint=hint_value,
-                        callback=lambda evt, param=param: self.date_time_picker(
-                            evt,
-                            param,
+                        callback=functools.partial(
+                            self.date_time_picker, param=param
                         ),
                     )
                 else:
@@ -1471,7 +1629,7 @@ class ParameterSection:
                 self.static_text[param.name] = widgets.static_text
                 self.gbs.Add(widgets.static_text, (2 * idx_param, 0))
                 self.gbs.Add(widgets.entry, flag=wx.EXPAND, pos=(2 * idx_param, 1))
-                if hasattr(widgets, "button"):
+                if getattr(widgets, "button", None) is not None:
                     self.gbs.Add(widgets.button, (2 * idx_param, 2))
                 self.gbs.Add(
                     widgets.text_error, flag=wx.EXPAND, pos=(2 * idx_param + 1, 1)
@@ -1487,24 +1645,7 @@ class ParameterSection:
 
     def date_time_picker(self, event, param):
         # Identify required input types
-        show_date = any(
-            [
-                bool(re.search(r"%[YymdUuVWjABbax]", format_str))
-                for format_str in param.type.formats
-            ]
-        )
-        show_time = any(
-            [
-                bool(re.search(r"%[HIpMSfzZX]", format_str))
-                for format_str in param.type.formats
-            ]
-        )
-        if show_time and not show_date:
-            mode = "time"
-        elif show_date and not show_time:
-            mode = "date"
-        else:
-            mode = "datetime"
+        mode = _date_time_mode(tuple(param.type.formats))
         mouse_pos = wx.GetMousePosition()
         if mode == "date":
             title = "Select Date"
@@ -1519,20 +1660,24 @@ class ParameterSection:
         # Initialize the datetime picker with the time currently in the entry, if any
         datetime_obj = None
         current_text_entry = self.entry[param.name].GetValue()
-        try:
-            # Parse the string to a datetime object
-            datetime_obj = datetime.datetime.strptime(
-                current_text_entry, param.type.formats[0]
-            )
-
-        except ValueError as exc:
-            if "unconverted data remains" in str(exc):
+        if current_text_entry:
+            # Parse the string to a datetime object, trying each accepted format
+            for format_str in param.type.formats:
+                try:
+                    datetime_obj = datetime.datetime.strptime(
+                        current_text_entry, format_str
+                    )
+                except ValueError:
+                    continue
+                break
+            else:
                 # If the string is too long, slice it to the length of a dummy formatted string
                 # This keeps "12:50" and drops ":40"
-                dummy_len = len(datetime.datetime.now().strftime(param.type.formats[0]))
-                datetime_obj = datetime.datetime.strptime(
-                    current_text_entry[:dummy_len], param.type.formats[0]
-                )
+                dummy_len = _formatted_length(param.type.formats[0])
+                with contextlib.suppress(ValueError):
+                    datetime_obj = datetime.datetime.strptime(
+                        current_text_entry[:dummy_len], param.type.formats[0]
+                    )
 
         hbox = wx.BoxSizer(wx.VERTICAL)
 
@@ -1540,8 +1685,9 @@ class ParameterSection:
             self.date_picker = wx.adv.CalendarCtrl(dlg)
             if datetime_obj:
                 # Set the date using wx.DateTime
-                wx_date = wx.DateTime()
-                wx_date.Set(datetime_obj.day, datetime_obj.month - 1, datetime_obj.year)
+                wx_date = wx.DateTime.FromDMY(
+                    datetime_obj.day, datetime_obj.month - 1, datetime_obj.year
+                )
                 self.date_picker.SetDate(wx_date)
             hbox.Add(self.date_picker, flag=wx.ALL | wx.CENTER, border=5)
 
@@ -1549,8 +1695,7 @@ class ParameterSection:
             self.time_picker = wx.adv.TimePickerCtrl(dlg)
             if datetime_obj:
                 # Set the time using wx.DateTime
-                wx_time = wx.DateTime()
-                wx_time.SetHMS(
+                wx_time = wx.DateTime.FromHMS(
                     datetime_obj.hour, datetime_obj.minute, datetime_obj.second
                 )
                 self.time_picker.SetValue(wx_time)
@@ -1578,8 +1723,8 @@ class ParameterSection:
                 )
             else:
                 # In case we have multiple formats, pick the most complete one (with more format specifiers)
-                most_complete_format = max(
-                    param.type.formats, key=lambda s: s.count("%")
+                most_complete_format = _most_complete_format(
+                    tuple(param.type.formats)
                 )
                 self.entry[param.name].SetValue(
                     datetime.datetime.fromisoformat(
@@ -1589,47 +1734,63 @@ class ParameterSection:
                     ).strftime(most_complete_format)
                 )
 
-    def dir_open(self, event, param):
-        dlg = wx.DirDialog(
-            self.panel,
-            message="Choose Directory",
-            defaultPath=os.getcwd(),
-            style=wx.RESIZE_BORDER,
+    def get_last_folder(self, param):
+        """Return the last folder browsed for this parameter, or for any parameter"""
+        return (
+            self.panel.last_folders.get(param.name)
+            or self.panel.last_folder
+            or os.getcwd()
         )
+
+    def set_last_folder(self, param, folder):
+        """Remember the last folder browsed, for this parameter and globally"""
+        self.panel.last_folders[param.name] = folder
+        self.panel.last_folder = folder
+
+    def get_dir_dialog(self) -> wx.DirDialog:
+        """Return the directory dialog of the panel, created on first use"""
+        if self.panel.dir_dialog is None:
+            self.panel.dir_dialog = wx.DirDialog(
+                self.panel, message="Choose Directory", style=wx.RESIZE_BORDER
+            )
+        return self.panel.dir_dialog
+
+    def get_file_dialog(self, style: int) -> wx.FileDialog:
+        """Return the file dialog of the panel with this style, created on first use"""
+        dlg = self.panel.file_dialogs.get(style)
+        if dlg is None:
+            dlg = self.panel.file_dialogs[style] = wx.FileDialog(
+                self.panel, style=style
+            )
+        return dlg
+
+    def dir_open(self, event, param):
+        path = self.entry[param.name].GetValue()
+        dlg = self.get_dir_dialog()
+        dlg.SetPath(path or self.get_last_folder(param))
         if dlg.ShowModal() == wx.ID_OK:
             path = dlg.GetPath()
-            dlg.Destroy()
+            self.set_last_folder(param, path)
             self.entry[param.name].SetValue(path)
 
     def file_open(self, event, param):
         # Should we let the user select multiple files?
-        multiple = (hasattr(param, "multiple") and param.multiple) or (param.nargs != 1)
+        multiple = getattr(param, "multiple", False) or (param.nargs != 1)
+        # click.File has a mode, click.Path has readable / writable flags
+        file_mode = getattr(param.type, "mode", None) or ""
         # Read mode ?
-        if (hasattr(param.type, "readable") and param.type.readable) or (
-            hasattr(param.type, "mode") and "r" in param.type.mode
-        ):
+        if getattr(param.type, "readable", False) or "r" in file_mode:
             mode = "read"
         # Write mode (overwrite readable if both are True)
-        if (hasattr(param.type, "writable") and param.type.writable) or (
-            hasattr(param.type, "mode") and "w" in param.type.mode
-        ):
+        if getattr(param.type, "writable", False) or "w" in file_mode:
             mode = "write"
-        # If help text is something like:
-        # Excel file (.xlsx, .csv)
-        # Text file (.txt or .log)
-        # Extract the file type and the extensions, so that the file
-        # dialog can filter the files
+        # Filter the files with the file types given in the help text, if any
         wildcards = "All files|*.*"
-        if hasattr(param, "help") and param.help:
-            wildcard_raw = re.search(r"(\w+) file[s]? \(([a-zA-Z ,\.]*)\)", param.help)
-            if wildcard_raw:
-                file_type, extensions_raw = wildcard_raw.groups()
-                extensions = re.findall(r"\.(\w+(?:\.\w+)?)", extensions_raw)
-                extensions_text = ";".join([f"*.{ext}" for ext in extensions])
-                wildcards = f"{file_type} files|{extensions_text}"
+        if help_text := getattr(param, "help", None):
+            wildcards = _file_wildcards(help_text)
         path = self.entry[param.name].GetValue()
         message = "Choose a file"
-        last_folder = Path(path).parent if path != "" else os.getcwd()
+        last_folder = Path(path).parent if path != "" else self.get_last_folder(param)
         if mode == "read":
             style = wx.FD_OPEN | wx.FD_CHANGE_DIR | wx.FD_FILE_MUST_EXIST
             if multiple:
@@ -1637,24 +1798,24 @@ class ParameterSection:
                 message = "Choose files"
         else:
             style = wx.FD_SAVE | wx.FD_CHANGE_DIR | wx.FD_OVERWRITE_PROMPT
-        dlg = wx.FileDialog(
-            self.panel,
-            message=message,
-            defaultDir=str(last_folder),
-            defaultFile="",
-            wildcard=wildcards,
-            style=style,
-        )
+        dlg = self.get_file_dialog(style)
+        dlg.SetMessage(message)
+        dlg.SetDirectory(str(last_folder))
+        dlg.SetFilename("")
+        dlg.SetWildcard(wildcards)
 
         # Show the dialog and retrieve the user response. If it is the OK response,
         # process the data.
         if dlg.ShowModal() == wx.ID_OK:
             # This returns a Python list of files that were selected.
             if multiple:
-                path = json.dumps(dlg.GetPaths())
+                paths = dlg.GetPaths()
+                path = json.dumps(paths)
+                if paths:
+                    self.set_last_folder(param, os.path.dirname(paths[0]))
             else:
                 path = dlg.GetPath()
-            dlg.Destroy()
+                self.set_last_folder(param, os.path.dirname(path))
             self.entry[param.name].SetValue(path)
 
 
@@ -1663,7 +1824,7 @@ class CommandPanel(scrolled.ScrolledPanel):
         self, parent: Guick, ctx: Context, name: str, config: TOMLDocument
     ) -> None:
         super().__init__(parent)
-        self.SetBackgroundColour(wx.SystemSettings.GetColour(wx.SYS_COLOUR_WINDOW))
+        self.SetBackgroundColour(_get_colour(wx.SYS_COLOUR_WINDOW))
         self.entries = {}
         self.text_errors = {}
         self.static_texts = {}
@@ -1671,6 +1832,14 @@ class CommandPanel(scrolled.ScrolledPanel):
         self.command_name = name
         self.config = config
         self.sections = {}
+        # Last folders browsed with the file / directory dialogs, per parameter
+        # name and for any parameter
+        self.last_folders = {}
+        self.last_folder = None
+        # File dialogs (keyed by style) and directory dialog, created on first
+        # use and reused afterwards
+        self.file_dialogs = {}
+        self.dir_dialog = None
         self.SetupScrolling(scroll_x=False, scroll_y=True)
 
         # Get the command
@@ -1681,79 +1850,107 @@ class CommandPanel(scrolled.ScrolledPanel):
             # Otherwise, get the main command
             command = ctx.command
 
-        # Set the longest parameter name for alignment
-        with contextlib.suppress(ValueError):
-            longest_param_name = max([param.name for param in command.params], key=len)
-            NormalEntry.init_class(longest_param_name)
-
         main_boxsizer = wx.BoxSizer(wx.VERTICAL)
-        panels = defaultdict(list)
-        user_defined_panels = []
+        self.params_by_name = {param.name: param for param in command.params}
+        # Parameters that get an entry in the panel
+        self.visible_params = []
+        required_params = []
+        optional_params = []
+        # User defined panels, kept in order of first appearance
+        user_panels = {}
         for param in command.params:
             if (
-                (not param.is_eager)
-                and (
-                    (hasattr(param, "hidden") and not param.hidden)
-                    or (not hasattr(param, "hidden"))
-                )
-                and param.name not in {"install_completion", "show_completion"}
+                param.is_eager
+                or getattr(param, "hidden", False)
+                or param.name in TYPER_COMPLETION_PARAMS
             ):
-                if hasattr(param, "rich_help_panel") and (
-                    panel_name := param.rich_help_panel
-                ):
-                    panels[panel_name].append(param)
-                    if panel_name not in user_defined_panels:
-                        user_defined_panels.append(panel_name)
-                elif param.required:
-                    panels["Required Parameters"].append(param)
-                else:
-                    panels["Optional Parameters"].append(param)
+                continue
+            self.visible_params.append(param)
+            if panel_name := getattr(param, "rich_help_panel", None):
+                panel_params = user_panels.get(panel_name)
+                if panel_params is None:
+                    panel_params = user_panels[panel_name] = []
+                panel_params.append(param)
+            elif param.required:
+                required_params.append(param)
+            else:
+                optional_params.append(param)
+        # Set the longest parameter name for alignment
+        longest_param_name = max(
+            (param.name for param in self.visible_params), key=len, default=""
+        )
+        NormalEntry.init_class(self, longest_param_name)
+
         list_panels = [
-            "Required Parameters",
-            *user_defined_panels,
-            "Optional Parameters",
+            ("Required Parameters", required_params),
+            *user_panels.items(),
+            ("Optional Parameters", optional_params),
         ]
 
-        for panel in list_panels:
-            if panels[panel]:
-                self.sections[panel] = ParameterSection(
-                    self.config, command.name, self, panel, panels[panel], main_boxsizer
-                )
-                self.entries.update(self.sections[panel].entry)
-                self.text_errors.update(self.sections[panel].text_error)
-                self.static_texts.update(self.sections[panel].static_text)
-
-        self.SetSizer(main_boxsizer)
-        self.Layout()
+        # Don't redraw while the widgets are added, the panel is laid out once
+        self.Freeze()
+        try:
+            for panel, panel_params in list_panels:
+                if panel_params:
+                    self.sections[panel] = ParameterSection(
+                        self.config,
+                        command.name,
+                        self,
+                        panel,
+                        panel_params,
+                        main_boxsizer,
+                    )
+                    self.entries.update(self.sections[panel].entry)
+                    self.text_errors.update(self.sections[panel].text_error)
+                    self.static_texts.update(self.sections[panel].static_text)
+
+            self.SetSizer(main_boxsizer)
+            self.Layout()
+        finally:
+            self.Thaw()
         self.best_size = main_boxsizer.GetMinSize()
 
     def on_exit(self, event):
         self.Close()
 
 
+@functools.lru_cache(maxsize=None)
+def _make_history_folder(history_folder: Path) -> None:
+    """Create the history folder, once per process."""
+    history_folder.mkdir(parents=True, exist_ok=True)
+
+
 class Guick(wx.Frame):
     def __init__(self, ctx: Context, size: wx.Size = None, color_engine: str = "optimized") -> None:
         wx.Frame.__init__(self, None, -1, ctx.command.name)
         self.ctx = ctx
         self.cmd_panels = {}
+        # Name of the command panel currently displayed
+        self.active_panel_name = None
+        self.help_description = None
 
-        # Create the menu bar
-        self.create_help_menu()
-
-        # Set history file name
+        # Set history file name (its folder is only created when saving)
         history_folder = (
             Path(click.get_app_dir("guick", roaming=False)) / "history" / ctx.info_name
         )
-        history_folder.mkdir(parents=True, exist_ok=True)
         self.history_file = history_folder / "history.toml"
 
-        # Load the history file if it exists
+        # Load the history file: a parse error is raised here, so that a file
+        # that could not be read is never overwritten
         self.config = tomlkit.document()
-        try:
-            with open(self.history_file, encoding="utf-8") as fp:
-                self.config = tomlkit.load(fp)
-        except FileNotFoundError:
-            pass
+        self.load_history()
+        # A single thread writes the history contents queued by on_ok_button
+        self.history_queue = queue.SimpleQueue()
+        self.history_saver = threading.Thread(target=self.save_history, daemon=True)
+        self.history_saver.start()
+        # A single worker thread runs the commands queued by on_ok_button, one
+        # after the other, so their outputs don't interleave in the log
+        self.invoke_queue = queue.SimpleQueue()
+        self.invoker = threading.Thread(target=self.invoke_commands, daemon=True)
+        self.invoker.start()
+
+        # Create the menu bar
+        self.create_help_menu()
 
         self.Bind(wx.EVT_CLOSE, self.on_exit)
 
@@ -1787,28 +1984,20 @@ class Guick(wx.Frame):
                 .CaptionVisible(False)
                 .Layer(1),
             )
-            panel_width = -1
-            panel_height = self.nav_size.height
-            for panel_name in self.ctx.command.commands.keys():
-                self._mgr.AddPane(
-                    self.cmd_panels[panel_name],
-                    aui.AuiPaneInfo()
-                    .Name(panel_name)
-                    .CenterPane()
-                    .PaneBorder(False)
-                    .Hide(),
-                )
-                if self.cmd_panels[panel_name].best_size.width > panel_width:
-                    panel_width = self.cmd_panels[panel_name].best_size.width
-                if self.cmd_panels[panel_name].best_size.height > panel_height:
-                    panel_height = self.cmd_panels[panel_name].best_size.height
-            self.show_panel(list(self.ctx.command.commands.keys())[0])
+            # Only the first command panel is built now, the other ones are
+            # built the first time they are shown
+            first_panel_name = list(self.ctx.command.commands.keys())[0]
+            self.show_panel(first_panel_name)
+            first_panel = self.cmd_panels[first_panel_name]
+            panel_width = first_panel.best_size.width
+            panel_height = max(self.nav_size.height, first_panel.best_size.height)
             total_width = self.nav_size.width + panel_width + 30
 
         # Otherwise, create a single panel
         else:
             panel = CommandPanel(self, ctx, "", self.config)
             self.cmd_panels[ctx.command.name] = panel
+            self.active_panel_name = ctx.command.name
 
             self._mgr.AddPane(
                 panel,
@@ -1845,11 +2034,11 @@ class Guick(wx.Frame):
         art = self._mgr.GetArtProvider()
         art.SetColour(
             aui.AUI_DOCKART_INACTIVE_CAPTION_COLOUR,
-            wx.SystemSettings.GetColour(wx.SYS_COLOUR_BTNFACE),
+            _get_colour(wx.SYS_COLOUR_BTNFACE),
         )
         art.SetColour(
             aui.AUI_DOCKART_INACTIVE_CAPTION_GRADIENT_COLOUR,
-            wx.SystemSettings.GetColour(wx.SYS_COLOUR_BTNFACE),
+            _get_colour(wx.SYS_COLOUR_BTNFACE),
         )
         art.SetColour(aui.AUI_DOCKART_INACTIVE_CAPTION_TEXT_COLOUR, wx.BLACK)
         # Font caption in bold
@@ -1939,6 +2128,63 @@ class Guick(wx.Frame):
 
         self.Show()
 
+    def load_history(self):
+        """Load the history file if it exists"""
+        try:
+            with open(self.history_file, encoding="utf-8") as fp:
+                self.config = tomlkit.load(fp)
+        except FileNotFoundError:
+            pass
+
+    def queue_history_save(self):
+        """Save the history in the background"""
+        self.history_queue.put(tomlkit.dumps(self.config))
+
+    def flush_history(self):
+        """Wait until the queued history contents are written"""
+        self.history_queue.put(None)
+        self.history_saver.join(timeout=5)
+
+    def save_history(self):
+        """Atomically replace the history file with the latest queued content.
+
+        Runs in the history_saver thread until None is queued.
+        """
+        stop = False
+        while not stop:
+            contents = [self.history_queue.get()]
+            with contextlib.suppress(queue.Empty):
+                while True:
+                    contents.append(self.history_queue.get_nowait())
+            stop = None in contents
+            # Contents queued while writing are superseded by the latest one
+            content = next((c for c in reversed(contents) if c is not None), None)
+            if content is None:
+                continue
+            # Don't let a failed write stop the thread: the next save retries
+            with contextlib.suppress(OSError):
+                _make_history_folder(self.history_file.parent)
+                tmp_file = self.history_file.with_suffix(".toml.tmp")
+                with open(tmp_file, mode="w", encoding="utf-8") as fp:
+                    fp.write(content)
+                os.replace(tmp_file, self.history_file)
+
+    def invoke_commands(self):
+        """Invoke the queued (command, context) pairs, one at a time.
+
+        Runs in the invoker thread for the lifetime of the frame.
+        """
+        while True:
+            command, ctx = self.invoke_queue.get()
+            try:
+                command.invoke(ctx)
+            except SystemExit:
+                pass
+            except Exception:
+                # Report the error as an unhandled thread exception would,
+                # but keep the thread alive for the next commands
+                traceback.print_exc()
+
     def _unlock_log_sash(self):
         # Retrieve the form pane info
         pane = self._mgr.GetPane("log")
@@ -1953,14 +2199,19 @@ class Guick(wx.Frame):
         # Right panel for content
         self.nav_panel, self.nav_size = self.create_left_sidebar()
 
-        for name in self.ctx.command.commands:
-            command = self.ctx.command.commands.get(name)
-            panel = CommandPanel(self, self.ctx, name, self.config)
-            self.cmd_panels[name] = panel
+    def create_command_panel(self, name):
+        """Build the panel of a subcommand and add it (hidden) to the AUI manager"""
+        panel = CommandPanel(self, self.ctx, name, self.config)
+        self.cmd_panels[name] = panel
+        self._mgr.AddPane(
+            panel,
+            aui.AuiPaneInfo().Name(name).CenterPane().PaneBorder(False).Hide(),
+        )
+        return panel
 
     def create_ok_cancel_buttons(self):
         panel = wx.Panel(self)
-        panel.SetBackgroundColour(wx.SystemSettings.GetColour(wx.SYS_COLOUR_BTNFACE))
+        panel.SetBackgroundColour(_get_colour(wx.SYS_COLOUR_BTNFACE))
         sizer = wx.BoxSizer(wx.HORIZONTAL)
 
         ok_btn = wx.Button(panel, wx.ID_OK, "OK")
@@ -1983,7 +2234,7 @@ class Guick(wx.Frame):
         # Left sidebar for navigation
         nav_panel = wx.Panel(self)
         nav_panel.SetBackgroundColour(
-            wx.SystemSettings.GetColour(wx.SYS_COLOUR_BTNFACE)
+            _get_colour(wx.SYS_COLOUR_BTNFACE)
         )
 
         nav_sizer = wx.BoxSizer(wx.VERTICAL)
@@ -2018,19 +2269,42 @@ class Guick(wx.Frame):
 
     def show_panel(self, panel_name):
         """Switch to the selected panel"""
-        # Hide all panels
-        for name, panel in self.cmd_panels.items():
-            self._mgr.GetPane(name).Hide()
+        # Repaint the frame once, when the new panel is in place
+        self.Freeze()
+        try:
+            # Build the panel the first time it is shown
+            if (
+                panel_name not in self.cmd_panels
+                and panel_name in self.ctx.command.commands
+            ):
+                panel = self.create_command_panel(panel_name)
+                # Command panels only scroll vertically: widen the frame if the
+                # new panel doesn't fit (within the screen)
+                needed_width = self.nav_size.width + panel.best_size.width + 30
+                client_size = self.GetClientSize()
+                if needed_width > client_size.width:
+                    decoration_width = self.GetSize().width - client_size.width
+                    max_width = wx.GetClientDisplayRect().width - decoration_width
+                    self.SetClientSize(
+                        wx.Size(min(needed_width, max_width), client_size.height)
+                    )
 
-        # Show selected panel
-        if panel_name in self.cmd_panels:
-            self._mgr.GetPane(panel_name).Show()
+            # Hide the panel currently shown (the others are already hidden)
+            if self.active_panel_name in self.cmd_panels:
+                self._mgr.GetPane(self.active_panel_name).Hide()
 
-        # Update button selection
-        for name, btn in self.nav_buttons:
-            btn.set_selected(name == panel_name)
+            # Show selected panel
+            if panel_name in self.cmd_panels:
+                self._mgr.GetPane(panel_name).Show()
+                self.active_panel_name = panel_name
 
-        self._mgr.Update()
+            # Update button selection
+            for name, btn in self.nav_buttons:
+                btn.set_selected(name == panel_name)
+
+            self._mgr.Update()
+        finally:
+            self.Thaw()
 
     def create_help_menu(self) -> None:
         # Create Help menu
@@ -2056,6 +2330,7 @@ class Guick(wx.Frame):
         self.SetMenuBar(menubar)
 
     def on_exit(self, event):
+        self.flush_history()
         # Destroys the main frame which quits the wxPython application
         self.Destroy()
         sys.exit()
@@ -2073,7 +2348,10 @@ class Guick(wx.Frame):
     def on_help(self, event):
         head = self.ctx.command.name
 
-        if isinstance(self.ctx.command, (TyperCommandGui, TyperGroupGui)):
+        # The help text does not change: only format it the first time
+        if self.help_description is not None:
+            description = self.help_description
+        elif isinstance(self.ctx.command, (TyperCommandGui, TyperGroupGui)):
             import unittest.mock as mock
             from contextlib import redirect_stdout
 
@@ -2087,9 +2365,8 @@ class Guick(wx.Frame):
                 description = f.getvalue()
 
         else:
-            formatter = click.HelpFormatter()
-            self.ctx.command.format_help(self.ctx, formatter)
             description = self.ctx.command.get_help(self.ctx)
+        self.help_description = description
         dlg = AboutDialog(self, "Help", head, description, name="HelpDialog")
         dlg.ShowModal()
         dlg.Destroy()
@@ -2114,14 +2391,12 @@ class Guick(wx.Frame):
         dlg.Destroy()
 
     def on_close_button(self, event):
+        self.flush_history()
         sys.exit()
 
     def on_ok_button(self, event) -> None:
-        sel_cmd_name, sel_cmd_panel = [
-            (name, cmd_panel)
-            for name, cmd_panel in self.cmd_panels.items()
-            if cmd_panel.IsShown()
-        ][0]
+        sel_cmd_name = self.active_panel_name
+        sel_cmd_panel = self.cmd_panels[sel_cmd_name]
 
         # Get the selected command
         try:
@@ -2130,9 +2405,11 @@ class Guick(wx.Frame):
             selected_command = self.ctx.command
 
         # If the command section does not exist in the history file, create it
+        history_changed = False
         if sel_cmd_name and sel_cmd_name not in self.config:
             script_history = tomlkit.table()
             self.config.add(sel_cmd_name, script_history)
+            history_changed = True
 
         opts = {}
         errors = {}
@@ -2147,10 +2424,8 @@ class Guick(wx.Frame):
                     elif isinstance(selected_command, click.Command):
                         opts[key] = UNSET
             else:
-                param = [p for p in selected_command.params if p.name == key][0]
-                if param.nargs not in (None, 1) or (
-                    hasattr(param, "multiple") and param.multiple
-                ):
+                param = sel_cmd_panel.params_by_name[key]
+                if param.nargs not in (None, 1) or getattr(param, "multiple", False):
                     # Try to parse as JSON to handle lists
                     try:
                         opts[key] = json.loads(value)
@@ -2160,7 +2435,7 @@ class Guick(wx.Frame):
                         ] = "Unexpected error in the list, probably a syntax error?"
                         opts[key] = ""
                 else:
-                    opts[key] = entry.GetValue()
+                    opts[key] = value
         args = []
 
         # Parse parameters and save errors if any
@@ -2168,54 +2443,66 @@ class Guick(wx.Frame):
         for param in selected_command.params:
             # Remove default to avoid having user empty fields being set to default
             # values without knowing it
-            if not (hasattr(param, "hidden") and param.hidden):
+            if not getattr(param, "hidden", False):
                 param.default = UNSET
             if param.name in errors:
                 continue
             try:
                 _, args = param.handle_parse_result(self.ctx, opts, args)
-            except click.exceptions.BadParameter as exc:
-                errors[exc.param.name] = exc
+            except click.exceptions.UsageError as exc:
+                # BadParameter knows the failing parameter, which may be
+                # another one (e.g. in a callback), UsageError doesn't
+                failed_param = getattr(exc, "param", None) or param
+                errors[failed_param.name] = exc
             except Exception as exc:
                 # Don't overwrite existing errors
                 if param.name not in errors:
                     errors[param.name] = "Unexpected error, probably a syntax error?"
 
-        # Display errors if any
-        for param in selected_command.params:
-            if (hasattr(param, "hidden") and not param.hidden) or (
-                not hasattr(param, "hidden")
-            ):
-                if errors.get(param.name):
-                    sel_cmd_panel.text_errors[param.name].SetLabel(
-                        "‼️ " + str(errors[param.name])
-                    )
-                    sel_cmd_panel.text_errors[param.name].SetToolTip(
-                        str(errors[param.name])
-                    )
-                else:
-                    with contextlib.suppress(KeyError):
-                        sel_cmd_panel.text_errors[param.name].SetLabel("")
+        # Display errors once all parameters are parsed, as parsing a parameter
+        # may report an error on a previous one
+        text_errors = sel_cmd_panel.text_errors
+        for param in sel_cmd_panel.visible_params:
+            text_error = text_errors[param.name]
+            error = errors.get(param.name)
+            if error:
+                text_error.SetLabel("‼️ " + str(error))
+                text_error.SetToolTip(str(error))
+            else:
+                text_error.SetLabel("")
+
+        # If there are none, save the parameters to the history file
+        script_history = self.config.get(sel_cmd_name)
+        if not errors and script_history is not None:
+            for param in sel_cmd_panel.visible_params:
+                # Save each parameter except hidden ones and password fields
+                if getattr(param, "hide_input", False):
+                    continue
+                with contextlib.suppress(KeyError, tomlkit.exceptions.ConvertError):
+                    value = opts[param.name]
+                    if (
+                        param.name not in script_history
+                        or script_history[param.name] != value
+                    ):
+                        script_history[param.name] = value
+                        history_changed = True
 
         # If there are errors, we stop here
         if errors:
             return
 
-        # Save the parameters to the history file
-        for param in selected_command.params:
-            # Save each parameter except hidden ones and password fields
-            if not (hasattr(param, "hide_input") and param.hide_input):
-                with contextlib.suppress(KeyError, tomlkit.exceptions.ConvertError):
-                    self.config[sel_cmd_name][param.name] = opts[param.name]
-        with open(self.history_file, mode="w", encoding="utf-8") as fp:
-            tomlkit.dump(self.config, fp)
-
-        # Invoke the command in a separate thread to avoid blocking the GUI
-        self.ctx.args = args
-        self.thread = threading.Thread(
-            target=selected_command.invoke, args=(self.ctx,), daemon=True
-        )
-        self.thread.start()
+        # Only write the history file if a value changed, without blocking the GUI
+        if history_changed:
+            self.queue_history_save()
+
+        # Invoke the command in the invoker thread to avoid blocking the GUI.
+        # Queue a snapshot of the context: the next clicks reset and refill
+        # self.ctx while this command may still be waiting in the queue
+        ctx = copy.copy(self.ctx)
+        ctx.params = dict(self.ctx.params)
+        ctx.args = list(args)
+        ctx._parameter_source = dict(self.ctx._parameter_source)
+        self.invoke_queue.put((selected_command, ctx))
 
 
 class CommonGui:
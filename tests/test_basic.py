@@ -1184,3 +1184,171 @@ def test_help(wx_app, tmp_path, mocker):
     # mocker.patch("guick.Guick.on_close_buttton", lambda: pass)
     with pytest.raises(SystemExit):
         set_name()
+
+
+def _reject_name(ctx, param, value):
+    raise click.UsageError("name rejected by the callback")
+
+
+def _reject_name_without_param(ctx, param, value):
+    raise click.BadParameter("name rejected by the callback")
+
+
+@pytest.mark.parametrize("callback", [_reject_name, _reject_name_without_param])
+def test_usage_error_in_callback(wx_app, tmp_path, mocker, callback):
+
+    @click.command(cls=guick.CommandGui)
+    @click.option("--name", callback=callback)
+    def set_name(name):
+        logger.info(name)
+
+    logger.remove()
+    logger.add(
+        tmp_path / "logfile.log",
+        level="INFO",
+    )
+    mocker.patch("wx.App")
+    mocker.patch("wx.App.MainLoop")
+    mocker.patch("click.get_app_dir", return_value=str(tmp_path))
+
+    original_init = guick.Guick
+    def init_gui(ctx, size=None):
+        guick = original_init(ctx)
+        guick.cmd_panels["set-name"].entries["name"].SetValue("Dirk")
+        guick.on_ok_button(None)
+        error = guick.cmd_panels["set-name"].text_errors["name"].GetLabel()
+        if error:
+            logger.info(error)
+            guick.on_close_button(None)
+        return guick
+    mocker.patch("guick.gui.Guick", init_gui)
+    with pytest.raises(SystemExit):
+        set_name()
+    assert "name rejected by the callback" in (tmp_path / "logfile.log").read_text(encoding="utf-8")
+
+
+def test_error_reported_on_previous_parameter(wx_app, tmp_path, mocker):
+
+    def check_last(ctx, param, value):
+        raise click.BadParameter(
+            "does not match the last name", ctx=ctx, param=ctx.command.params[0]
+        )
+
+    @click.command(cls=guick.CommandGui)
+    @click.option("--first")
+    @click.option("--last", callback=check_last)
+    def set_name(first, last):
+        logger.info(f"{first} {last}")
+
+    logger.remove()
+    logger.add(
+        tmp_path / "logfile.log",
+        level="INFO",
+    )
+    mocker.patch("wx.App")
+    mocker.patch("wx.App.MainLoop")
+    mocker.patch("click.get_app_dir", return_value=str(tmp_path))
+
+    original_init = guick.Guick
+    def init_gui(ctx, size=None):
+        guick = original_init(ctx)
+        guick.cmd_panels["set-name"].entries["first"].SetValue("Dirk")
+        guick.cmd_panels["set-name"].entries["last"].SetValue("Gently")
+        guick.on_ok_button(None)
+        error = guick.cmd_panels["set-name"].text_errors["first"].GetLabel()
+        if error:
+            logger.info(error)
+            guick.on_close_button(None)
+        return guick
+    mocker.patch("guick.gui.Guick", init_gui)
+    with pytest.raises(SystemExit):
+        set_name()
+    assert "does not match the last name" in (tmp_path / "logfile.log").read_text(encoding="utf-8")
+
+
+def test_dirname_browse_button(wx_app, tmp_path, mocker):
+
+    mocker.patch("wx.App")
+    mocker.patch("wx.App.MainLoop")
+    mocker.patch("click.get_app_dir", return_value=str(tmp_path))
+
+    mock_dialog = mocker.Mock()
+    mock_dialog.GetPath.return_value = str(tmp_path)
+    mock_dialog.ShowModal.return_value = wx.ID_OK
+
+    mocker.patch(
+        "guick.gui.wx.DirDialog",
+        return_value=mock_dialog
+    )
+
+    @click.command(cls=guick.CommandGui)
+    @click.option("--folder", type=click.Path(exists=True, file_okay=False, dir_okay=True, path_type=str))
+    def set_folder(folder):
+        logger.info(folder)
+    logger.remove()
+    logger.add(
+        tmp_path / "logfile.log",
+        level="INFO",
+    )
+
+    original_init = guick.Guick
+    def init_gui(ctx, size=None):
+        guick = original_init(ctx)
+        panel = guick.cmd_panels["set-folder"]
+        # Click the Browse button, as the user would
+        button = [
+            child for child in panel.GetChildren()
+            if isinstance(child, wx.Button) and child.GetLabel() == "Browse"
+        ][0]
+        event = wx.CommandEvent(wx.wxEVT_BUTTON, button.GetId())
+        event.SetEventObject(button)
+        button.GetEventHandler().ProcessEvent(event)
+        assert panel.entries["folder"].GetValue() == str(tmp_path)
+        guick.on_ok_button(None)
+        return guick
+    mocker.patch("guick.gui.Guick", init_gui)
+    with pytest.raises(SystemExit):
+        set_folder()
+    assert str(tmp_path) in (tmp_path / "logfile.log").read_text(encoding="utf-8")
+
+
+@pytest.mark.parametrize(
+    ("span", "expect"),
+    [(0, 1), (1, 1), (10, 1), (11, 10), (100, 10), (101, 100)],
+)
+def test_slider_tick_frequency(span, expect):
+    assert guick.gui._tick_frequency(span) == expect
+
+
+def test_multiple_option_history(wx_app, tmp_path, mocker):
+    @click.command(cls=guick.CommandGui)
+    @click.option("--files", multiple=True)
+    def cli(files):
+        logger.info(f"FILES:[{files}]")
+
+    logger.remove()
+    logger.add(
+        tmp_path / "logfile.log",
+        level="INFO",
+    )
+    mocker.patch("wx.App")
+    mocker.patch("wx.App.MainLoop")
+    mocker.patch("click.get_app_dir", return_value=str(tmp_path))
+
+    original_init = guick.Guick
+    def init_gui(ctx, size=None):
+        first = original_init(ctx)
+        first.cmd_panels["cli"].entries["files"].SetValue('["a.txt", "b.txt"]')
+        first.on_ok_button(None)
+        first.flush_history()
+        # Build the frame again, prefilled with the list saved in the history
+        guick = original_init(ctx)
+        assert (
+            guick.cmd_panels["cli"].entries["files"].GetValue() == '["a.txt", "b.txt"]'
+        )
+        guick.on_ok_button(None)
+        return guick
+    mocker.patch("guick.gui.Guick", init_gui)
+    with pytest.raises(SystemExit):
+        cli()
+    assert "FILES:[('a.txt', 'b.txt')]" in (tmp_path / "logfile.log").read_text(encoding="utf-8")
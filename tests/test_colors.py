@@ -3,6 +3,7 @@ import time
 import click
 import pytest
 import sys
+import types
 import wx
 from loguru import logger
 import io
@@ -263,3 +264,83 @@ def test_string_rgb(wx_app, mocker, capsys):
 
             assert text_attr.GetBackgroundColour()[:3] == (200, 50, 150)
             assert text_attr.GetTextColour()[:3] == (10, 120, 244)
+
+
+WHITE = guick.TermColors.WHITE
+BLACK = guick.TermColors.BLACK
+
+
+def _segments(text):
+    # iter_segments only reads the default colors of the log control
+    log = types.SimpleNamespace(default_fg=WHITE, default_bg=BLACK)
+    return list(guick.gui.RedirectText.iter_segments(log, text))
+
+
+@pytest.mark.parametrize(
+    ("text", "expected"),
+    [
+        # Consecutive pieces of text sharing the same style are merged
+        (
+            "a\x1b[31mb\x1b[31mc",
+            [
+                ("a", WHITE, BLACK, False, False, False, False, False),
+                ("bc", guick.TermColors.RED, BLACK, False, False, False, False, False),
+            ],
+        ),
+        # Bold, then reset
+        (
+            "a\x1b[1mb\x1b[0mc",
+            [
+                ("a", WHITE, BLACK, False, False, False, False, False),
+                ("b", WHITE, BLACK, False, False, False, True, False),
+                ("c", WHITE, BLACK, False, False, False, False, False),
+            ],
+        ),
+        # Progress bars stay in their own segment
+        (
+            "\x1b[32m\r 10%\x1b[32m\r 20%",
+            [
+                ("\r 10%", guick.TermColors.GREEN, BLACK, False, False, False, False, False),
+                ("\r 20%", guick.TermColors.GREEN, BLACK, False, False, False, False, False),
+            ],
+        ),
+        # Escape sequences other than SGR are kept as text
+        (
+            "\x1b[2Kdone",
+            [("\x1b[2Kdone", WHITE, BLACK, False, False, False, False, False)],
+        ),
+        # 256 colors: color cube and grayscale ramp
+        (
+            "\x1b[38;5;196mred\x1b[48;5;240mgray",
+            [
+                ("red", (255, 0, 0), BLACK, False, False, False, False, False),
+                ("gray", (255, 0, 0), (88, 88, 88), False, False, False, False, False),
+            ],
+        ),
+        # RGB colors
+        (
+            "\x1b[38;2;10;120;244;48;2;200;50;150mrgb",
+            [("rgb", (10, 120, 244), (200, 50, 150), False, False, False, False, False)],
+        ),
+    ],
+)
+def test_iter_segments(text, expected):
+    assert _segments(text) == expected
+
+
+@pytest.mark.parametrize(
+    ("text", "expected_fg"),
+    [
+        # Incomplete sequences are ignored
+        ("\x1b[38;5mq", WHITE),
+        ("\x1b[38;2;1mq", WHITE),
+        ("\x1b[38;2;1;2mq", WHITE),
+        # Out of range values
+        ("\x1b[38;5;300mq", WHITE),
+        ("\x1b[38;2;1;300;4mq", (1, 255, 4)),
+    ],
+)
+def test_iter_segments_invalid_extended_color(text, expected_fg):
+    assert _segments(text) == [
+        ("q", expected_fg, BLACK, False, False, False, False, False)
+    ]